@@ -1,24 +1,327 @@
+import functools
+import re
+from types import SimpleNamespace
+
 import streamlit as st
-from qiskit import QuantumCircuit
-from qiskit.quantum_info import Statevector, DensityMatrix, Operator
-from qiskit.visualization import plot_bloch_vector
 import numpy as np
-import matplotlib.pyplot as plt
 
-# Helper: Bloch vector from state
+try:
+    from numba import njit
+except ImportError:  # numba is optional; the batch kernel falls back to NumPy
+    njit = None
+
+# Heavy Qiskit/Plotly imports live behind a cached resource: Streamlit
+# re-executes this script on every rerun and hot reload, and this keeps the
+# import work to once per process.
+@st.cache_resource
+def _quantum():
+    from qiskit.quantum_info import Statevector, DensityMatrix
+    import plotly.graph_objects as go
+    return SimpleNamespace(
+        Statevector=Statevector,
+        DensityMatrix=DensityMatrix,
+        go=go,
+    )
+
+_q = _quantum()
+
+# Precomputed 2x2 gate matrices (skips building a QuantumCircuit per gate)
+_GATE_MATRICES = {
+    "X": np.array([[0, 1], [1, 0]], dtype=complex),
+    "Y": np.array([[0, -1j], [1j, 0]], dtype=complex),
+    "Z": np.array([[1, 0], [0, -1]], dtype=complex),
+    "H": np.array([[1, 1], [1, -1]], dtype=complex) / np.sqrt(2),
+    "S": np.array([[1, 0], [0, 1j]], dtype=complex),
+    "Sdg": np.array([[1, 0], [0, -1j]], dtype=complex),
+    "T": np.array([[1, 0], [0, np.exp(1j * np.pi / 4)]], dtype=complex),
+    "Tdg": np.array([[1, 0], [0, np.exp(-1j * np.pi / 4)]], dtype=complex),
+}
+
+# Rotation gate matrices (angle in radians)
+def rx_matrix(theta):
+    c, s = np.cos(theta / 2), np.sin(theta / 2)
+    return np.array([[c, -1j * s], [-1j * s, c]], dtype=complex)
+
+def ry_matrix(theta):
+    c, s = np.cos(theta / 2), np.sin(theta / 2)
+    return np.array([[c, -s], [s, c]], dtype=complex)
+
+def rz_matrix(theta):
+    return np.array([[np.exp(-1j * theta / 2), 0], [0, np.exp(1j * theta / 2)]], dtype=complex)
+
+_ROTATION_MATRICES = {"RX": rx_matrix, "RY": ry_matrix, "RZ": rz_matrix}
+
+# Rotation angles are quantized to 1e-6 rad so repeated reruns with the same
+# slider value (step=0.01) hit the cache instead of rebuilding the matrix.
+def _quantize_angle(angle):
+    return int(round(angle * 1e6))
+
+@functools.lru_cache(maxsize=1024)
+def _rotation_2x2(gate, angle_q):
+    return _ROTATION_MATRICES[gate](angle_q / 1e6)
+
+# SO(3) Bloch rotations: a single-qubit unitary rotates the Bloch vector by a
+# 3x3 real matrix, so pure-state dynamics need no complex arithmetic at all.
+_SQ2 = np.sqrt(2) / 2
+_SO3_MATRICES = {
+    "X": np.diag([1.0, -1.0, -1.0]),
+    "Y": np.diag([-1.0, 1.0, -1.0]),
+    "Z": np.diag([-1.0, -1.0, 1.0]),
+    "H": np.array([[0.0, 0.0, 1.0], [0.0, -1.0, 0.0], [1.0, 0.0, 0.0]]),
+    "S": np.array([[0.0, -1.0, 0.0], [1.0, 0.0, 0.0], [0.0, 0.0, 1.0]]),
+    "Sdg": np.array([[0.0, 1.0, 0.0], [-1.0, 0.0, 0.0], [0.0, 0.0, 1.0]]),
+    "T": np.array([[_SQ2, -_SQ2, 0.0], [_SQ2, _SQ2, 0.0], [0.0, 0.0, 1.0]]),
+    "Tdg": np.array([[_SQ2, _SQ2, 0.0], [-_SQ2, _SQ2, 0.0], [0.0, 0.0, 1.0]]),
+}
+
+def rx_so3(theta):
+    c, s = np.cos(theta), np.sin(theta)
+    return np.array([[1.0, 0.0, 0.0], [0.0, c, -s], [0.0, s, c]])
+
+def ry_so3(theta):
+    c, s = np.cos(theta), np.sin(theta)
+    return np.array([[c, 0.0, s], [0.0, 1.0, 0.0], [-s, 0.0, c]])
+
+def rz_so3(theta):
+    c, s = np.cos(theta), np.sin(theta)
+    return np.array([[c, -s, 0.0], [s, c, 0.0], [0.0, 0.0, 1.0]])
+
+_SO3_ROTATIONS = {"RX": rx_so3, "RY": ry_so3, "RZ": rz_so3}
+
+@functools.lru_cache(maxsize=1024)
+def _rotation_so3(gate, angle_q):
+    return _SO3_ROTATIONS[gate](angle_q / 1e6)
+
+_PAULIS = (_GATE_MATRICES["X"], _GATE_MATRICES["Y"], _GATE_MATRICES["Z"])
+
+# Helper: SO(3) Bloch rotation for an arbitrary 2x2 unitary
+def so3_from_unitary(u):
+    udg = u.conj().T
+    r = np.empty((3, 3))
+    for i, si in enumerate(_PAULIS):
+        for j, sj in enumerate(_PAULIS):
+            r[i, j] = np.trace(si @ u @ sj @ udg).real / 2
+    return r
+
+# Helper: SO(3) Bloch rotation for a named gate (param: angle or custom matrix)
+def gate_rotation(gate, param=None):
+    if gate in _SO3_MATRICES:
+        return _SO3_MATRICES[gate]
+    if gate in _SO3_ROTATIONS:
+        return _rotation_so3(gate, _quantize_angle(param))
+    return so3_from_unitary(param)
+
+# Helper: fused SO(3) rotation for a whole gate sequence
+def sequence_rotation(seq):
+    r = np.eye(3)
+    for g, p in seq:
+        r = gate_rotation(g, p) @ r
+    return r
+
+# Helper: pure state from a Bloch vector (fixes the global phase so a is real)
+def bloch_to_statevector(bloch):
+    x, y, z = bloch
+    theta = np.arccos(np.clip(z, -1.0, 1.0))
+    phi = np.arctan2(y, x)
+    return _q.Statevector([np.cos(theta / 2), np.exp(1j * phi) * np.sin(theta / 2)])
+
+# Helper: build a 2x2 complex matrix by scalar assignment, skipping np.array's
+# list-of-lists traversal. Deliberately a fresh buffer per call rather than a
+# module-level scratch: Streamlit sessions are threads in one process, and the
+# results get stored (gate_sequence, DensityMatrix), so aliasing a shared
+# buffer would corrupt them.
+def _matrix_2x2(m00, m01, m10, m11):
+    m = np.empty((2, 2), dtype=np.complex128)
+    m[0, 0] = m00
+    m[0, 1] = m01
+    m[1, 0] = m10
+    m[1, 1] = m11
+    return m
+
+# Helper: density matrix from a Bloch vector, rho = (I + xX + yY + zZ)/2
+def bloch_to_density_matrix(bloch):
+    x, y, z = bloch
+    return _q.DensityMatrix(_matrix_2x2((1 + z) / 2, (x - 1j * y) / 2,
+                                        (x + 1j * y) / 2, (1 - z) / 2))
+
+# Helper: 2x2 matrix for a named gate (angle only used for RX/RY/RZ)
+def gate_matrix(gate, angle=None):
+    if gate in _GATE_MATRICES:
+        return _GATE_MATRICES[gate]
+    return _rotation_2x2(gate, _quantize_angle(angle))
+
+# Helper: apply a 2x2 unitary directly to the state, bypassing circuit evolution
+def apply_matrix(state, mat):
+    if isinstance(state, _q.Statevector):
+        return _q.Statevector(mat @ state.data)
+    return _q.DensityMatrix(mat @ state.data @ mat.conj().T)
+
+# Complex-number parser for the matrix-entry text fields. Accepts "a", "bj"
+# and "a+bj" (including bare "j" / "-j"); much cheaper than complex() with its
+# exception path, which would re-render the whole app on every typo.
+_NUM = r"[+-]?(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?"
+_COMPLEX_RE = re.compile(
+    rf"^\s*(?:(?P<re1>{_NUM})\s*(?P<im1>[+-](?:\s*(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?)?)\s*[jJ]"
+    rf"|(?P<im2>{_NUM}|[+-]?)\s*[jJ]"
+    rf"|(?P<re2>{_NUM}))\s*$"
+)
+
+def _imag_value(s):
+    s = s.replace(" ", "")
+    if s in ("", "+"):
+        return 1.0
+    if s == "-":
+        return -1.0
+    return float(s)
+
+# Helper: parse a complex entry, returning (value, ok) instead of raising
+def parse_complex(text):
+    m = _COMPLEX_RE.match(text)
+    if not m:
+        return 0j, False
+    if m.group("im1") is not None:
+        return complex(float(m.group("re1")), _imag_value(m.group("im1"))), True
+    if m.group("im2") is not None:
+        return complex(0.0, _imag_value(m.group("im2"))), True
+    return complex(float(m.group("re2")), 0.0), True
+
+# Closed-form 2x2 unitarity test: columns have unit norm and are orthogonal.
+# Memoized on the entries so an unchanged matrix is validated only once.
+@functools.lru_cache(maxsize=256)
+def _is_unitary_2x2(u00, u01, u10, u11):
+    n0 = (u00.conjugate() * u00 + u10.conjugate() * u10).real
+    n1 = (u01.conjugate() * u01 + u11.conjugate() * u11).real
+    dot = u00.conjugate() * u01 + u10.conjugate() * u11
+    return abs(n0 - 1) < 1e-8 and abs(n1 - 1) < 1e-8 and abs(dot) < 1e-8
+
+# Helper: parse four labelled entries into a 2x2 matrix, reporting bad fields
+def parse_matrix_entries(labels, defaults):
+    values, bad = [], []
+    for name, default in zip(labels, defaults):
+        value, ok = parse_complex(st.text_input(name, default))
+        values.append(value)
+        if not ok:
+            bad.append(name)
+    return values, bad
+
+# Predefined input states, built once per process instead of on every rerun
+# (st.cache_resource, because Streamlit re-executes script-level code per rerun)
+@st.cache_resource
+def _predefined_states():
+    return {
+        "|0⟩": _q.Statevector.from_label("0"),
+        "|1⟩": _q.Statevector.from_label("1"),
+        "|+⟩ = (|0⟩ + |1⟩)/√2": _q.Statevector([1/np.sqrt(2), 1/np.sqrt(2)]),
+        "|-⟩ = (|0⟩ - |1⟩)/√2": _q.Statevector([1/np.sqrt(2), -1/np.sqrt(2)]),
+        "|i⟩ = (|0⟩ + i|1⟩)/√2": _q.Statevector([1/np.sqrt(2), 1j/np.sqrt(2)]),
+        "|-i⟩ = (|0⟩ - i|1⟩)/√2": _q.Statevector([1/np.sqrt(2), -1j/np.sqrt(2)]),
+    }
+
+_PREDEFINED_STATES = _predefined_states()
+_PREDEFINED_LABELS = tuple(_PREDEFINED_STATES)
+
+# Batch Bloch-vector extraction for sweep/animation workloads: takes an (n, 2)
+# complex array of pure states and returns an (n, 3) float array. JIT-compiled
+# when numba is installed; single states should keep using get_bloch_vector,
+# where the JIT warmup would dominate.
+def _bloch_batch_impl(states):
+    n = states.shape[0]
+    out = np.empty((n, 3))
+    for i in range(n):
+        a = states[i, 0]
+        b = states[i, 1]
+        ar, ai = a.real, a.imag
+        br, bi = b.real, b.imag
+        out[i, 0] = 2 * (ar * br + ai * bi)
+        out[i, 1] = 2 * (ar * bi - ai * br)
+        out[i, 2] = ar * ar + ai * ai - br * br - bi * bi
+    return out
+
+if njit is not None:
+    bloch_batch = njit(cache=True, fastmath=True)(_bloch_batch_impl)
+else:
+    bloch_batch = _bloch_batch_impl
+
+# Static Bloch-sphere scene: the translucent sphere and the three axes are
+# identical for every state, so their traces are built once per process and
+# shared between figures; only the state arrow changes from rerun to rerun.
+@st.cache_resource
+def _sphere_traces():
+    go = _q.go
+    u, v = np.mgrid[0:2 * np.pi:40j, 0:np.pi:20j]
+    sx, sy, sz = np.cos(u) * np.sin(v), np.sin(u) * np.sin(v), np.cos(v)
+    sphere = go.Surface(x=sx, y=sy, z=sz, opacity=0.2, showscale=False,
+                        colorscale="Blues", hoverinfo="skip")
+    axes = [go.Scatter3d(x=ax, y=ay, z=az, mode="lines", showlegend=False,
+                         hoverinfo="skip", line=dict(color="gray", width=2))
+            for ax, ay, az in (((-1, 1), (0, 0), (0, 0)),
+                               ((0, 0), (-1, 1), (0, 0)),
+                               ((0, 0), (0, 0), (-1, 1)))]
+    return [sphere] + axes
+
+# Cached pretty-printer for state data: fixed precision keeps the display
+# stable and avoids re-formatting full-precision floats on every rerun. The
+# key is a tuple of (real, imag) floats because Streamlit's hasher cannot
+# hash complex values.
+@st.cache_data(max_entries=256)
+def _pretty_data(parts, shape):
+    data = np.array([complex(r, i) for r, i in parts]).reshape(shape)
+    return np.array2string(data, precision=4, suppress_small=True)
+
+# Helper: show the numerical representation of a state
+def show_state_data(state):
+    data = state.data
+    parts = tuple((c.real, c.imag) for c in data.ravel().tolist())
+    st.code(_pretty_data(parts, data.shape), language="python")
+
+# Helper: show a Bloch vector on the sphere. Plotly renders client-side via
+# WebGL, so the browser keeps the static sphere scene and only the arrow
+# trace is reserialized when the vector changes.
+def show_bloch(xyz, key=None):
+    go = _q.go
+    x, y, z = (float(c) for c in xyz)
+    arrow = go.Cone(x=[x], y=[y], z=[z], u=[x], v=[y], w=[z],
+                    sizemode="absolute", sizeref=0.25, anchor="tip",
+                    showscale=False, colorscale=[[0, "red"], [1, "red"]])
+    shaft = go.Scatter3d(x=[0, x], y=[0, y], z=[0, z], mode="lines",
+                         showlegend=False, line=dict(color="red", width=5))
+    fig = go.Figure(data=_sphere_traces() + [shaft, arrow])
+    fig.update_layout(
+        scene=dict(aspectmode="cube",
+                   xaxis=dict(range=[-1.1, 1.1], title="x"),
+                   yaxis=dict(range=[-1.1, 1.1], title="y"),
+                   zaxis=dict(range=[-1.1, 1.1], title="z")),
+        margin=dict(l=0, r=0, t=0, b=0),
+    )
+    st.plotly_chart(fig, width="stretch", key=key)
+
+# Helper: show a state on the Bloch sphere
+def show_bloch_sphere(state, key=None):
+    show_bloch(get_bloch_vector(state), key=key)
+
+# Scalar arithmetic throughout: for 2-element inputs every np.conj/np.real
+# ufunc call costs more in dispatch than the whole computation.
+@functools.lru_cache(maxsize=128)
+def _bloch_cached(key):
+    if key[0] == "sv":
+        _, a, b = key
+        ar, ai, br, bi = a.real, a.imag, b.real, b.imag
+        x = 2 * (ar * br + ai * bi)
+        y = 2 * (ar * bi - ai * br)
+        z = ar * ar + ai * ai - br * br - bi * bi
+        return (x, y, z)
+    _, r00, r01, r10, r11 = key
+    return (2 * r01.real, 2 * r10.imag, (r00 - r11).real)
+
+# Helper: Bloch vector from state, memoized on the underlying amplitudes so
+# reruns with an unchanged state skip the recomputation
 def get_bloch_vector(state):
-    if isinstance(state, Statevector):
-        a, b = state.data
-        x = 2 * np.real(np.conj(a) * b)
-        y = 2 * np.imag(np.conj(a) * b)
-        z = np.abs(a)**2 - np.abs(b)**2
-        return [x, y, z]
-    elif isinstance(state, DensityMatrix):
-        rho = state.data
-        x = 2 * np.real(rho[0, 1])
-        y = 2 * np.imag(rho[1, 0])
-        z = np.real(rho[0, 0] - rho[1, 1])
-        return [x, y, z]
+    if isinstance(state, _q.Statevector):
+        a, b = state.data.tolist()
+        return _bloch_cached(("sv", a, b))
+    elif isinstance(state, _q.DensityMatrix):
+        r00, r01, r10, r11 = state.data.ravel().tolist()
+        return _bloch_cached(("dm", r00, r01, r10, r11))
 
 # App
 st.title("🔮 Bloch Sphere Visualizer")
@@ -28,16 +331,8 @@ input_type = st.selectbox("Select input type:", ["Predefined State", "Custom Pur
 
 # 1. Predefined
 if input_type == "Predefined State":
-    state_options = {
-        "|0⟩": Statevector.from_label("0"),
-        "|1⟩": Statevector.from_label("1"),
-        "|+⟩ = (|0⟩ + |1⟩)/√2": Statevector([1/np.sqrt(2), 1/np.sqrt(2)]),
-        "|-⟩ = (|0⟩ - |1⟩)/√2": Statevector([1/np.sqrt(2), -1/np.sqrt(2)]),
-        "|i⟩ = (|0⟩ + i|1⟩)/√2": Statevector([1/np.sqrt(2), 1j/np.sqrt(2)]),
-        "|-i⟩ = (|0⟩ - i|1⟩)/√2": Statevector([1/np.sqrt(2), -1j/np.sqrt(2)]),
-    }
-    label = st.selectbox("Choose state:", list(state_options.keys()))
-    state = state_options[label]
+    label = st.selectbox("Choose state:", _PREDEFINED_LABELS)
+    state = _PREDEFINED_STATES[label]
 
 # 2. Custom Pure State
 elif input_type == "Custom Pure State":
@@ -53,146 +348,136 @@ elif input_type == "Custom Pure State":
         st.error("Vector cannot be zero.")
         state = None
     else:
-        state = Statevector([a / norm, b / norm])
+        state = _q.Statevector([a / norm, b / norm])
 
 # 3. Density Matrix
 elif input_type == "Density Matrix":
     st.write("Enter 2x2 complex density matrix elements ρ01")
-    try:
-        r00 = complex(st.text_input("ρ00", "0.5"))
-        r01 = complex(st.text_input("ρ01", "0.5"))
-        r10 = complex(st.text_input("ρ10", "0.5"))
-        r11 = complex(st.text_input("ρ11", "0.5"))
-
-        matrix = np.array([[r00, r01], [r10, r11]], dtype=complex)
-
-        is_hermitian = np.allclose(matrix, matrix.conj().T)
-        trace = np.trace(matrix)
-        is_trace_one = np.allclose(trace, 1)
-        eigenvals = np.linalg.eigvalsh(matrix)
-        is_positive_semidefinite = np.all(eigenvals >= -1e-10)
+    (r00, r01, r10, r11), bad = parse_matrix_entries(
+        ("ρ00", "ρ01", "ρ10", "ρ11"), ("0.5", "0.5", "0.5", "0.5"))
+    if bad:
+        st.error(f"❌ Invalid input: {', '.join(bad)}")
+        state = None
+    else:
+        # Closed-form 2x2 checks: Hermiticity, trace and positivity follow from
+        # the four entries directly, so no LAPACK eigendecomposition is needed.
+        is_hermitian = (abs(r00.imag) < 1e-8 and abs(r11.imag) < 1e-8
+                        and abs(r01 - r10.conjugate()) < 1e-8)
+        trace = r00.real + r11.real
+        det = (r00 * r11 - r01 * r10).real
+        is_trace_one = abs(trace - 1) < 1e-8
+        # Both eigenvalues are >= 0 iff trace >= 0 and determinant >= 0
+        is_positive_semidefinite = trace >= -1e-10 and det >= -1e-10
 
         if not is_hermitian:
             st.error("❌ Matrix is not Hermitian (ρ ≠ ρ†).")
         if not is_trace_one:
             st.error(f"❌ Trace is not 1 (Trace = {trace}).")
         if not is_positive_semidefinite:
+            disc = np.sqrt(max(trace * trace - 4 * det, 0.0))
+            eigenvals = ((trace - disc) / 2, (trace + disc) / 2)
             st.error(f"❌ Matrix is not positive semi-definite (eigenvalues: {eigenvals}).")
 
         if is_hermitian and is_trace_one and is_positive_semidefinite:
-            state = DensityMatrix(matrix)
+            state = _q.DensityMatrix(_matrix_2x2(r00, r01, r10, r11))
             st.success("✅ Valid density matrix!")
         else:
             state = None
 
-    except Exception as e:
-        st.error(f"❌ Invalid input: {e}")
-        state = None
-
 # Plot initial
 if state is not None:
     st.subheader("Initial State on Bloch Sphere")
-    fig = plot_bloch_vector(get_bloch_vector(state))
-    st.pyplot(fig)
+    show_bloch_sphere(state, key="initial_bloch")
 
     # Show initial state data
     st.write("🔢 Initial State Mathematical Representation:")
-    if isinstance(state, Statevector):
-        st.code(str(state.data), language="python")
-    elif isinstance(state, DensityMatrix):
-        st.code(str(state.data), language="python")
+    show_state_data(state)
 
 
     st.header("Step 2: Apply Gates")
     mode = st.radio("Choose mode:", ["Test Single Gate", "Test Gate Sequence"])
 
     if mode == "Test Single Gate":
-        gate = st.selectbox("Choose a gate to apply:", ["X", "Y", "Z", "H", "S", "Sdg", "T", "Tdg", "RX", "RY", "RZ", "Custom Unitary"])
+        gate = st.selectbox("Choose a gate to apply:", ["X", "Y", "Z", "H", "S", "Sdg", "T", "Tdg", "RX", "RY", "RZ", "Custom Unitary"], key="single_gate")
         angle = 0
         custom_matrix = None
 
         if gate in ["RX", "RY", "RZ"]:
-            angle = st.slider(f"Rotation angle for {gate} (radians)", -2*np.pi, 2*np.pi, 0.0, step=0.01)
+            angle = st.slider(f"Rotation angle for {gate} (radians)", -2*np.pi, 2*np.pi, 0.0, step=0.01, key="single_angle")
 
         if gate == "Custom Unitary":
-            try:
-                u00 = complex(st.text_input("U00", "1"))
-                u01 = complex(st.text_input("U01", "0"))
-                u10 = complex(st.text_input("U10", "0"))
-                u11 = complex(st.text_input("U11", "1"))
-                custom_matrix = np.array([[u00, u01], [u10, u11]], dtype=complex)
-                if not np.allclose(custom_matrix.conj().T @ custom_matrix, np.eye(2)):
-                    st.error("❌ Matrix is not unitary.")
-                    custom_matrix = None
-            except:
-                st.error("Invalid matrix elements.")
+            (u00, u01, u10, u11), bad = parse_matrix_entries(
+                ("U00", "U01", "U10", "U11"), ("1", "0", "0", "1"))
+            if bad:
+                st.error(f"❌ Invalid matrix elements: {', '.join(bad)}")
+            elif not _is_unitary_2x2(u00, u01, u10, u11):
+                st.error("❌ Matrix is not unitary.")
+            else:
+                custom_matrix = _matrix_2x2(u00, u01, u10, u11)
 
+        # The Apply button snapshots the chosen gate into session state, so the
+        # result stays on screen across reruns and dragging the slider only
+        # updates the stored angle; nothing is re-applied until the next click.
         if st.button("Apply Gate"):
-            qc = QuantumCircuit(1)
-            if gate == "X": qc.x(0)
-            elif gate == "Y": qc.y(0)
-            elif gate == "Z": qc.z(0)
-            elif gate == "H": qc.h(0)
-            elif gate == "S": qc.s(0)
-            elif gate == "Sdg": qc.sdg(0)
-            elif gate == "T": qc.t(0)
-            elif gate == "Tdg": qc.tdg(0)
-            elif gate == "RX": qc.rx(angle, 0)
-            elif gate == "RY": qc.ry(angle, 0)
-            elif gate == "RZ": qc.rz(angle, 0)
-            elif gate == "Custom Unitary" and custom_matrix is not None:
-                op = Operator(custom_matrix)
-                state = op @ state
-                qc = None
-
-            if qc is not None:
-                state = state.evolve(qc)
+            if gate == "Custom Unitary":
+                st.session_state.applied_gate = ("Custom", custom_matrix) if custom_matrix is not None else None
+            else:
+                st.session_state.applied_gate = (gate, angle)
 
+        applied_gate = st.session_state.get("applied_gate")
+        if applied_gate is not None:
+            g, p = applied_gate
+            state = apply_matrix(state, p if g == "Custom" else gate_matrix(g, p))
             st.subheader("Final State after Gate")
-            fig2 = plot_bloch_vector(get_bloch_vector(state))
-            st.pyplot(fig2)
+            show_bloch_sphere(state, key="final_bloch")
             st.write("Final State Mathematical Representation:")
-            st.code(str(state.data), language="python")
+            show_state_data(state)
 
     elif mode == "Test Gate Sequence":
         if "gate_sequence" not in st.session_state:
             st.session_state.gate_sequence = []
+        # Fused rotation for the whole committed sequence, kept in lockstep
+        # with gate_sequence by the Add/Undo/Clear handlers below.
+        if "R_total" not in st.session_state:
+            st.session_state.R_total = sequence_rotation(st.session_state.gate_sequence)
 
-        gate = st.selectbox("Choose a gate to add:", ["X", "Y", "Z", "H", "S", "Sdg", "T", "Tdg", "RX", "RY", "RZ", "Custom Unitary"])
+        gate = st.selectbox("Choose a gate to add:", ["X", "Y", "Z", "H", "S", "Sdg", "T", "Tdg", "RX", "RY", "RZ", "Custom Unitary"], key="seq_gate")
         angle = 0
         custom_matrix = None
 
         if gate in ["RX", "RY", "RZ"]:
-            angle = st.slider(f"Rotation angle for {gate} (radians)", -2*np.pi, 2*np.pi, 0.0, step=0.01)
+            angle = st.slider(f"Rotation angle for {gate} (radians)", -2*np.pi, 2*np.pi, 0.0, step=0.01, key="seq_angle")
 
         if gate == "Custom Unitary":
-            try:
-                u00 = complex(st.text_input("U00", "1"))
-                u01 = complex(st.text_input("U01", "0"))
-                u10 = complex(st.text_input("U10", "0"))
-                u11 = complex(st.text_input("U11", "1"))
-                custom_matrix = np.array([[u00, u01], [u10, u11]], dtype=complex)
-                if not np.allclose(custom_matrix.conj().T @ custom_matrix, np.eye(2)):
-                    st.error("❌ Matrix is not unitary.")
-                    custom_matrix = None
-            except:
-                st.error("Invalid matrix elements.")
+            (u00, u01, u10, u11), bad = parse_matrix_entries(
+                ("U00", "U01", "U10", "U11"), ("1", "0", "0", "1"))
+            if bad:
+                st.error(f"❌ Invalid matrix elements: {', '.join(bad)}")
+            elif not _is_unitary_2x2(u00, u01, u10, u11):
+                st.error("❌ Matrix is not unitary.")
+            else:
+                custom_matrix = _matrix_2x2(u00, u01, u10, u11)
 
         col1, col2, col3 = st.columns(3)
         with col1:
             if st.button("Add Gate"):
                 if gate in ["RX", "RY", "RZ"]:
-                    st.session_state.gate_sequence.append((gate, angle))
-                elif gate == "Custom Unitary" and custom_matrix is not None:
-                    st.session_state.gate_sequence.append(("Custom", custom_matrix))
+                    entry = (gate, angle)
+                elif gate == "Custom Unitary":
+                    entry = ("Custom", custom_matrix) if custom_matrix is not None else None
                 else:
-                    st.session_state.gate_sequence.append((gate, None))
+                    entry = (gate, None)
+                if entry is not None:
+                    st.session_state.gate_sequence.append(entry)
+                    st.session_state.R_total = gate_rotation(*entry) @ st.session_state.R_total
         with col2:
             if st.button("Undo Last Gate") and st.session_state.gate_sequence:
                 st.session_state.gate_sequence.pop()
+                st.session_state.R_total = sequence_rotation(st.session_state.gate_sequence)
         with col3:
             if st.button("Clear Gate Sequence"):
                 st.session_state.gate_sequence = []
+                st.session_state.R_total = np.eye(3)
 
         def format_gate(g, param):
             if g in ["RX", "RY", "RZ"]:
@@ -205,30 +490,16 @@ if state is not None:
         formatted_seq = [format_gate(g, p) for g, p in st.session_state.gate_sequence]
         st.write(f"🧩 Current Gate Sequence: {' → '.join(formatted_seq)}")
 
-        state_applied = state
-        for g, p in st.session_state.gate_sequence:
-            qc = QuantumCircuit(1)
-            if g == "X": qc.x(0)
-            elif g == "Y": qc.y(0)
-            elif g == "Z": qc.z(0)
-            elif g == "H": qc.h(0)
-            elif g == "S": qc.s(0)
-            elif g == "Sdg": qc.sdg(0)
-            elif g == "T": qc.t(0)
-            elif g == "Tdg": qc.tdg(0)
-            elif g == "RX": qc.rx(p, 0)
-            elif g == "RY": qc.ry(p, 0)
-            elif g == "RZ": qc.rz(p, 0)
-            elif g == "Custom":
-                op = Operator(p)
-                state_applied = op @ state_applied
-                qc = None
-
-            if qc is not None:
-                state_applied = state_applied.evolve(qc)
-
         st.subheader("Final State after Applying Gates")
-        fig2 = plot_bloch_vector(get_bloch_vector(state_applied))
-        st.pyplot(fig2)
+        # A single qubit is fully captured by its Bloch vector, for mixed
+        # states too, so both input types go through the fused rotation: one
+        # 3x3 multiply per rerun regardless of sequence length.
+        bloch_applied = st.session_state.R_total @ np.array(get_bloch_vector(state))
+        show_bloch(bloch_applied, key="final_bloch")
+        if isinstance(state, _q.Statevector):
+            state_applied = bloch_to_statevector(bloch_applied)
+        else:
+            state_applied = bloch_to_density_matrix(bloch_applied)
+
         st.write("🔢 Final State Mathematical Representation:")
-        st.code(str(state_applied.data), language="python")
+        show_state_data(state_applied)